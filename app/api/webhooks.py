@@ -1,134 +1,209 @@
+import asyncio
 import hashlib
 import hmac
 import logging
-from typing import Optional
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
 
-from fastapi import APIRouter, Request, HTTPException, Header, Depends
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Request, Response, HTTPException, Header, Depends
 
-from app.config import Settings
-from app.dependencies import get_github_client, get_ai_service, get_settings
+from app.dependencies import get_github_client, get_ai_service, get_webhook_secret
 from app.services.ai_service import AIService, FileDiff
 from app.services.github_client import GitHubClient, ReviewComment as GitHubReviewComment
+from app.utils.cache import TTLCache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# GitHub caps webhook payloads at 25 MB
+MAX_PAYLOAD_SIZE = 25 * 1024 * 1024
 
-def verify_signature(payload: bytes, signature: str, secret: str) -> bool:
+SIGNATURE_PATTERN = re.compile(r"sha256=[0-9a-f]{64}")
+
+# Reviews currently running, keyed by pull request and head commit
+_inflight_reviews: Dict["PullRequestRef", asyncio.Event] = {}
+
+# Reviews already posted, keyed by pull request and a digest of their comments, so redelivered
+# webhooks and repeated /review commands (served from the diff and AI caches) don't post twice
+_posted_reviews: TTLCache[Tuple[str, str, int, str], bool] = TTLCache(maxsize=1024, ttl=600)
+
+
+def verify_signature(payload: bytes, signature: str, secret: bytes) -> bool:
     """Verify GitHub webhook signature."""
-    if not signature:
+    # Reject malformed headers before hashing a potentially large payload
+    if not SIGNATURE_PATTERN.fullmatch(signature):
         return False
 
-    hash_algorithm, signature_value = signature.split("=")
-    mac = hmac.new(secret.encode(), msg=payload, digestmod=hashlib.sha256)
-    expected_signature = mac.hexdigest()
+    # Compare raw 32-byte digests rather than their hex encodings
+    provided_signature = bytes.fromhex(signature.removeprefix("sha256="))
+    # One-shot digest with a named algorithm takes OpenSSL's C fast path
+    expected_signature = hmac.digest(secret, payload, "sha256")
 
-    return hmac.compare_digest(expected_signature, signature_value)
+    return hmac.compare_digest(expected_signature, provided_signature)
 
 
 @router.post("/github")
 async def github_webhook(
     request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     x_hub_signature_256: Optional[str] = Header(None),
     x_github_event: Optional[str] = Header(None),
     github_client: GitHubClient = Depends(get_github_client),
     ai_service: AIService = Depends(get_ai_service),
-    settings: Settings = Depends(get_settings),
+    webhook_secret: bytes = Depends(get_webhook_secret),
 ):
     """Handle GitHub webhook events."""
 
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_PAYLOAD_SIZE:
+        logger.warning("Webhook payload too large")
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    # Skip reading, verifying and parsing the body for events we never act on
+    if x_github_event == "ping":
+        return {"status": "pong"}
+    if x_github_event not in HANDLED_EVENTS:
+        return Response(status_code=204)
+
     # Read raw body for signature verification
     body = await request.body()
 
     # Verify webhook signature
-    if not verify_signature(body, x_hub_signature_256 or "", settings.github_webhook_secret):
+    if not verify_signature(body, x_hub_signature_256 or "", webhook_secret):
         logger.warning("Invalid webhook signature")
         raise HTTPException(status_code=401, detail="Invalid signature")
 
-    # Parse JSON payload
-    payload = await request.json()
+    # Parse JSON payload from the body already read for signature verification
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        logger.warning("Invalid webhook payload")
+        raise HTTPException(status_code=400, detail="Invalid payload")
     action = payload.get("action", "")
 
-    logger.info(f"Received GitHub event: {x_github_event}.{action}")
+    logger.info("Received GitHub event: %s.%s", x_github_event, action)
 
-    # Handle pull request events
-    if x_github_event == "pull_request":
-        # Process PR opened or synchronized (new commits)
-        if action in ["opened", "synchronize"]:
-            await process_pull_request(payload, github_client, ai_service)
-            return {"status": "processing"}
+    handler = EVENT_HANDLERS.get((x_github_event or "", action))
+    if handler and handler(payload, background_tasks, github_client, ai_service):
+        response.status_code = 202
+        return {"status": "queued"}
 
-    # Handle issue comment events (includes PR comments)
-    elif x_github_event == "issue_comment":
-        # Process when comment is created
-        if action == "created":
-            comment_body = payload.get("comment", {}).get("body", "").strip()
+    return {"status": "ignored"}
 
-            # Check if comment contains /review command
-            if comment_body.startswith("/review"):
-                # Verify it's a pull request comment
-                if "pull_request" in payload.get("issue", {}):
-                    await process_review_command(payload, github_client, ai_service)
-                    return {"status": "processing"}
 
-    return {"status": "ignored"}
+@dataclass(frozen=True, slots=True, kw_only=True)
+class PullRequestRef:
+    """Identifies a pull request (and optionally its head commit) to review."""
 
+    owner: str
+    repo: str
+    pr_number: int
+    head_sha: Optional[str] = None
 
-async def process_review_command(payload: dict, github_client: GitHubClient, ai_service: AIService):
-    """Process a /review command from a PR comment."""
+    @classmethod
+    def from_payload(
+        cls, payload: dict, pr_number: int, head_sha: Optional[str] = None
+    ) -> "PullRequestRef":
+        """Build a reference from a webhook payload's repository and the given PR number."""
+        owner, repo = payload["repository"]["full_name"].split("/")
+        return cls(owner=owner, repo=repo, pr_number=pr_number, head_sha=head_sha)
 
-    issue = payload["issue"]
-    pr_number = issue["number"]
-    repo_full_name = payload["repository"]["full_name"]
-    owner, repo = repo_full_name.split("/")
+    def __str__(self) -> str:
+        return f"PR #{self.pr_number} in {self.owner}/{self.repo}"
 
-    logger.info(f"Processing /review command for PR #{pr_number} in {repo_full_name}")
 
-    await process_pull_request_review(owner, repo, pr_number, github_client, ai_service)
+def handle_pull_request(
+    payload: dict,
+    background_tasks: BackgroundTasks,
+    github_client: GitHubClient,
+    ai_service: AIService,
+) -> bool:
+    """Queue a review for a PR opened or synchronized (new commits)."""
+    pr = PullRequestRef.from_payload(
+        payload, payload["number"], head_sha=payload["pull_request"]["head"]["sha"]
+    )
+    logger.info("Processing %s", pr)
 
+    # Review runs after the response is sent so GitHub's delivery doesn't time out
+    background_tasks.add_task(process_pull_request_review, pr, github_client, ai_service)
+    return True
 
-async def process_pull_request(payload: dict, github_client: GitHubClient, ai_service: AIService):
-    """Process a pull request and perform AI code review."""
 
-    pr_number = payload["number"]
-    repo_full_name = payload["repository"]["full_name"]
-    owner, repo = repo_full_name.split("/")
+def handle_issue_comment(
+    payload: dict,
+    background_tasks: BackgroundTasks,
+    github_client: GitHubClient,
+    ai_service: AIService,
+) -> bool:
+    """Queue a review when a /review comment is created on a pull request."""
+    comment_body = payload.get("comment", {}).get("body", "").strip()
 
-    logger.info(f"Processing PR #{pr_number} in {repo_full_name}")
+    # Check if comment contains /review command and is on a pull request
+    if not comment_body.startswith("/review") or "pull_request" not in payload.get("issue", {}):
+        return False
+
+    pr = PullRequestRef.from_payload(payload, payload["issue"]["number"])
+    logger.info("Processing /review command for %s", pr)
+
+    background_tasks.add_task(process_pull_request_review, pr, github_client, ai_service)
+    return True
+
+
+EventHandler = Callable[[dict, BackgroundTasks, GitHubClient, AIService], bool]
+
+# Handlers keyed by (X-GitHub-Event, action); anything else is ignored
+EVENT_HANDLERS: Dict[Tuple[str, str], EventHandler] = {
+    ("pull_request", "opened"): handle_pull_request,
+    ("pull_request", "synchronize"): handle_pull_request,
+    ("issue_comment", "created"): handle_issue_comment,
+}
 
-    await process_pull_request_review(owner, repo, pr_number, github_client, ai_service)
+HANDLED_EVENTS = frozenset(event for event, _ in EVENT_HANDLERS)
 
 
 async def process_pull_request_review(
-    owner: str,
-    repo: str,
-    pr_number: int,
+    pr: PullRequestRef,
     github_client: GitHubClient,
     ai_service: AIService,
 ):
-    """Perform AI code review on a pull request."""
+    """Perform AI code review on a pull request (runs as a background task)."""
+
+    # Coalesce duplicate deliveries: wait for the running review instead of starting another
+    inflight = _inflight_reviews.get(pr)
+    if inflight:
+        logger.info("Review already in progress for %s, waiting for it", pr)
+        await inflight.wait()
+        return
+
+    done = asyncio.Event()
+    _inflight_reviews[pr] = done
 
     try:
         # Get PR diff
-        diff_files = await github_client.get_pr_diff(owner, repo, pr_number)
+        diff_files = await github_client.get_pr_diff(pr.owner, pr.repo, pr.pr_number, pr.head_sha)
 
         if not diff_files:
-            logger.info(f"No files to review in PR #{pr_number}")
+            logger.info("No files to review in %s", pr)
             return
 
-        # Combine all diffs into a single list
+        # Combine all diffs into a single list (already validated, so skip re-validation)
         files_with_diffs = [
-            FileDiff(name=file.filename, diff=file.patch) for file in diff_files if file.patch
+            FileDiff.model_construct(name=file.filename, diff=file.patch)
+            for file in diff_files
+            if file.patch
         ]
 
         if not files_with_diffs:
-            logger.info(f"No files with patches to review in PR #{pr_number}")
+            logger.info("No files with patches to review in %s", pr)
             return
 
-        # Analyze entire PR with AI in a single request
+        # Analyze entire PR with AI
         all_comments = await ai_service.review_pull_request(
             files_with_diffs=files_with_diffs,
-            context=f"Pull Request #{pr_number} in {owner}/{repo}",
+            context=f"Pull Request #{pr.pr_number} in {pr.owner}/{pr.repo}",
         )
 
         # Convert AI ReviewComments to GitHub ReviewComments
@@ -145,13 +220,25 @@ async def process_pull_request_review(
             for comment in all_comments
         ]
 
+        if not github_comments:
+            logger.info("No issues found in %s", pr)
+            return
+
+        comments_digest = hashlib.sha256(
+            orjson.dumps([(c.path, c.line, c.body) for c in github_comments])
+        ).hexdigest()
+        review_key = (pr.owner, pr.repo, pr.pr_number, comments_digest)
+        if _posted_reviews.get(review_key):
+            logger.info("Identical review already posted on %s, skipping", pr)
+            return
+
         # Post review comments
-        if github_comments:
-            await github_client.post_review(owner, repo, pr_number, github_comments)
-            logger.info(f"Posted {len(github_comments)} review comments on PR #{pr_number}")
-        else:
-            logger.info(f"No issues found in PR #{pr_number}")
+        await github_client.post_review(pr.owner, pr.repo, pr.pr_number, github_comments)
+        _posted_reviews.set(review_key, True)
+        logger.info("Posted %d review comments on %s", len(github_comments), pr)
 
     except Exception as e:
-        logger.error(f"Error processing PR #{pr_number}: {str(e)}", exc_info=True)
-        raise
+        logger.error("Error processing %s: %s", pr, e, exc_info=True)
+    finally:
+        del _inflight_reviews[pr]
+        done.set()
@@ -20,6 +20,10 @@ class Settings(BaseSettings):
     ai_api_key: str = ""
     ai_model: str = "gpt-4"
     ai_base_url: Optional[str] = None  # Optional: custom base URL for OpenAI-compatible APIs
+    ai_concurrency: int = 4  # Max concurrent requests to the AI API
+    ai_max_patch_length: int = 8000  # Per-file diffs longer than this are truncated
+    ai_max_prompt_tokens: int = 3000  # Diff token budget per AI request; larger PRs are split
+    ai_structured_output: bool = False  # Request JSON-schema output (e.g. gpt-4o and newer)
 
     # Application Settings
     log_level: str = "INFO"
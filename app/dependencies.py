@@ -1,34 +1,43 @@
-"""Dependency injection providers for FastAPI."""
+"""Dependency injection providers for FastAPI.
 
-from functools import lru_cache
-from typing import Optional
+Services are built once at startup (see the lifespan handler in ``app.main``) and stored
+on ``app.state``; the ``get_*`` providers only read them back for each request.
+"""
+
+from typing import Optional, cast
 
 import httpx
+from fastapi import Request
 
 from app.config import Settings
 from app.services.ai_service import AIService
 from app.services.github_client import GitHubClient
 from app.services.github_auth import GitHubAuthService
 from app.services.github_app_auth import GitHubAppCredentials
+from app.utils.rate_limit import RateLimitGate
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client."""
+    rate_limit_gate = RateLimitGate()
+    # HTTP/2 multiplexes concurrent GitHub calls over one connection; httpx already
+    # negotiates gzip via its default Accept-Encoding header
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0
+        ),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        headers={"User-Agent": "callisto/1.0"},
+        event_hooks={
+            "request": [rate_limit_gate.on_request],
+            "response": [rate_limit_gate.on_response],
+        },
+    )
 
 
-@lru_cache()
-def get_settings() -> Settings:
-    """Get settings instance (singleton)."""
-    return Settings()
-
-
-@lru_cache()
-def get_http_client() -> httpx.AsyncClient:
-    """Get HTTP client instance (singleton)."""
-    return httpx.AsyncClient()
-
-
-@lru_cache()
-def get_github_app_credentials() -> Optional[GitHubAppCredentials]:
-    """Get GitHub App credentials instance (singleton)."""
-    settings = get_settings()
-
+def create_github_app_credentials(settings: Settings) -> Optional[GitHubAppCredentials]:
+    """Create GitHub App credentials if the app is configured."""
     if not settings.github_app_id:
         return None
 
@@ -45,31 +54,51 @@ def get_github_app_credentials() -> Optional[GitHubAppCredentials]:
     return None
 
 
-@lru_cache()
-def get_github_auth_service() -> GitHubAuthService:
-    """Get GitHub auth service instance (singleton)."""
-    settings = get_settings()
-    http_client = get_http_client()
-    app_credentials = get_github_app_credentials()
-
-    return GitHubAuthService(
+def create_github_client(settings: Settings, http_client: httpx.AsyncClient) -> GitHubClient:
+    """Create the GitHub client with its auth service."""
+    auth_service = GitHubAuthService(
         http_client=http_client,
         personal_token=settings.github_token,
-        app_credentials=app_credentials,
+        app_credentials=create_github_app_credentials(settings),
     )
 
+    return GitHubClient(http_client=http_client, auth_service=auth_service)
 
-@lru_cache()
-def get_github_client() -> GitHubClient:
-    """Get GitHub client instance (singleton)."""
-    http_client = get_http_client()
-    auth_service = get_github_auth_service()
 
-    return GitHubClient(http_client=http_client, auth_service=auth_service)
+def create_ai_service(settings: Settings, http_client: httpx.AsyncClient) -> AIService:
+    """Create the AI service sharing the app HTTP client's connection pool."""
+    return AIService(
+        settings.ai_api_key,
+        settings.ai_model,
+        settings.ai_base_url,
+        max_concurrency=settings.ai_concurrency,
+        max_patch_length=settings.ai_max_patch_length,
+        max_prompt_tokens=settings.ai_max_prompt_tokens,
+        structured_output=settings.ai_structured_output,
+        http_client=http_client,
+    )
+
+
+def get_settings(request: Request) -> Settings:
+    """Get settings instance (singleton)."""
+    return cast(Settings, request.app.state.settings)
+
+
+def get_webhook_secret(request: Request) -> bytes:
+    """Get the webhook secret, encoded once at startup for signature verification."""
+    return cast(bytes, request.app.state.webhook_secret)
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Get HTTP client instance (singleton)."""
+    return cast(httpx.AsyncClient, request.app.state.http_client)
+
+
+def get_github_client(request: Request) -> GitHubClient:
+    """Get GitHub client instance (singleton)."""
+    return cast(GitHubClient, request.app.state.github_client)
 
 
-@lru_cache()
-def get_ai_service() -> AIService:
+def get_ai_service(request: Request) -> AIService:
     """Get AI service instance (singleton)."""
-    settings = get_settings()
-    return AIService(settings.ai_api_key, settings.ai_model, settings.ai_base_url)
+    return cast(AIService, request.app.state.ai_service)
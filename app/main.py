@@ -1,9 +1,11 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 from app.api import webhooks
 from app.config import Settings
+from app.dependencies import create_ai_service, create_github_client, create_http_client
 
 # Load settings
 settings = Settings()
@@ -18,10 +20,28 @@ logging.basicConfig(
 app_logger = logging.getLogger("app")
 app_logger.setLevel(getattr(logging, settings.log_level.upper()))
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared services on startup and close them on shutdown."""
+    http_client = create_http_client()
+
+    app.state.settings = settings
+    app.state.webhook_secret = settings.github_webhook_secret.encode()
+    app.state.http_client = http_client
+    app.state.github_client = create_github_client(settings, http_client)
+    app.state.ai_service = create_ai_service(settings, http_client)
+
+    yield
+
+    await http_client.aclose()
+
+
 app = FastAPI(
     title="Callisto AI Code Review Agent",
     description="GitHub agent that performs AI-assisted code reviews",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Include routers
@@ -1,13 +1,96 @@
+import asyncio
+import hashlib
 import logging
 from typing import List, Optional
-from openai import AsyncOpenAI
+import httpx
+import orjson
+from openai import DEFAULT_TIMEOUT, AsyncOpenAI, omit
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+from openai.types.shared_params import ResponseFormatJSONSchema
 from pydantic import BaseModel
 
+from app.utils.cache import TTLCache
 from app.utils.diff_augmenter import augment_diff_with_line_numbers
 
 logger = logging.getLogger(__name__)
 
+# Rough average for English text and code across common tokenizers
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_NOTE = "\n... (diff truncated)"
+
+SYSTEM_PROMPT = """You are an expert code reviewer. \
+Analyze the provided pull request diff and provide constructive feedback.
+Focus on:
+- Potential bugs or errors
+- Security vulnerabilities
+- Performance issues
+- Code quality and best practices
+- Maintainability concerns
+- Cross-file dependencies and interactions
+
+IMPORTANT: The diffs are augmented with line numbers at the beginning of each line.
+The format is "LINE_NUMBER: " followed by the diff content (e.g., "42: +    new code").
+When reporting issues, use the line number shown at the start of the line.
+
+For each issue found, provide:
+1. The file path where the issue occurs
+2. The line number where the issue occurs (use the number from the augmented diff)
+3. A clear description of the issue
+4. A suggestion for improvement
+
+Format your response as a JSON object with a "comments" array of objects with fields:
+- path: the file path
+- line: the line number in the diff (right side)
+- comment: the review comment
+
+Only report significant issues. \
+Avoid nitpicking on style unless it affects readability or maintainability.
+If the code looks good, return an empty "comments" array."""
+
+# Structured output schema matching SYSTEM_PROMPT, for models that support json_schema
+REVIEW_RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "review",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "comments": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "path": {"type": "string"},
+                            "line": {"type": "integer"},
+                            "comment": {"type": "string"},
+                        },
+                        "required": ["path", "line", "comment"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["comments"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def strip_code_fence(text: str) -> str:
+    """Remove an optional markdown code fence (```json ... ```) around text."""
+    # Plain string operations stay linear on degenerate output such as long whitespace runs
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.removeprefix("```").removeprefix("json")
+    return text.removesuffix("```").strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of text (about four characters per token)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
 
 class ReviewComment(BaseModel):
     """A review comment to post on a pull request."""
@@ -48,19 +131,48 @@ class AIService:
 
     model: str
     client: AsyncOpenAI
-
-    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None):
+    max_patch_length: int
+    max_prompt_tokens: int
+    structured_output: bool
+    _semaphore: asyncio.Semaphore
+    _review_cache: TTLCache[str, List[ReviewComment]]
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        max_patch_length: int = 8000,
+        max_prompt_tokens: int = 3000,
+        structured_output: bool = False,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.model = model
-        if base_url:
-            self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-        else:
-            self.client = AsyncOpenAI(api_key=api_key)
+        self.max_patch_length = max_patch_length
+        self.max_prompt_tokens = max_prompt_tokens
+        self.structured_output = structured_output
+        # Cap in-flight AI requests to avoid rate limiting (429) under concurrent reviews
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Identical prompts (e.g. redelivered webhooks) reuse the previous review
+        self._review_cache = TTLCache(maxsize=256, ttl=600)
+        # Reuse the app-wide connection pool when given; keep OpenAI's own (long) timeout
+        # rather than inheriting the pool's, since reviews can take minutes
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=DEFAULT_TIMEOUT,
+        )
 
     async def review_pull_request(
         self, files_with_diffs: List[FileDiff], context: str = ""
     ) -> List[ReviewComment]:
         """
-        Review entire pull request with all files in a single AI request.
+        Review entire pull request, combining file diffs into as few AI requests as possible.
+
+        Files are packed into batches that fit the prompt token budget; batches are reviewed
+        concurrently and their comments merged, so small PRs still go out as one request.
 
         Args:
             files_with_diffs: List of FileDiff objects containing file name and diff
@@ -73,40 +185,64 @@ class AIService:
         if not files_with_diffs:
             return []
 
-        system_prompt = """You are an expert code reviewer. \
-Analyze the provided pull request diff and provide constructive feedback.
-Focus on:
-- Potential bugs or errors
-- Security vulnerabilities
-- Performance issues
-- Code quality and best practices
-- Maintainability concerns
-- Cross-file dependencies and interactions
-
-IMPORTANT: The diffs are augmented with line numbers at the beginning of each line.
-The format is "LINE_NUMBER: " followed by the diff content (e.g., "42: +    new code").
-When reporting issues, use the line number shown at the start of the line.
-
-For each issue found, provide:
-1. The file path where the issue occurs
-2. The line number where the issue occurs (use the number from the augmented diff)
-3. A clear description of the issue
-4. A suggestion for improvement
-
-Format your response as a JSON array of objects with fields:
-- path: the file path
-- line: the line number in the diff (right side)
-- comment: the review comment
-
-Only report significant issues. \
-Avoid nitpicking on style unless it affects readability or maintainability.
-If the code looks good, return an empty array."""
-
-        # Combine all diffs into a single prompt with line numbers
-        combined_diff = ""
-        for file_diff in files_with_diffs:
-            augmented_diff = augment_diff_with_line_numbers(file_diff.diff)
-            combined_diff += f"\n\n=== File: {file_diff.name} ===\n{augmented_diff}"
+        # Augment each diff with line numbers, then pack the sections into batches
+        sections = [self._build_section(file_diff) for file_diff in files_with_diffs]
+
+        batches = self._batch_sections(sections)
+        results = await asyncio.gather(*[self._review_batch(batch, context) for batch in batches])
+        comments = [comment for batch_comments in results for comment in batch_comments]
+
+        logger.info(
+            "AI reviewed PR with %d files in %d requests: found %d issues",
+            len(files_with_diffs),
+            len(batches),
+            len(comments),
+        )
+        return comments
+
+    def _build_section(self, file_diff: FileDiff) -> str:
+        """Render one file's augmented diff, truncated to fit a single request's budget."""
+        header = f"\n\n=== File: {file_diff.name} ===\n"
+        augmented_diff = augment_diff_with_line_numbers(self._truncate_patch(file_diff.diff))
+        truncated = len(file_diff.diff) > self.max_patch_length
+
+        # An oversized file gets a batch of its own, so it must fit the budget by itself;
+        # measure after augmenting so the line-number prefixes are accounted for
+        max_chars = max(
+            0,
+            (self.max_prompt_tokens - 1) * CHARS_PER_TOKEN - len(header) - len(TRUNCATION_NOTE),
+        )
+        if len(augmented_diff) > max_chars:
+            augmented_diff = augmented_diff[:max_chars].rpartition("\n")[0]
+            truncated = True
+
+        if truncated:
+            augmented_diff += TRUNCATION_NOTE
+        return header + augmented_diff
+
+    def _batch_sections(self, sections: List[str]) -> List[List[str]]:
+        """Greedily pack file sections into batches within the prompt token budget."""
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+
+        for section in sections:
+            section_tokens = estimate_tokens(section)
+            # An oversized file still gets a batch of its own
+            if batch and batch_tokens + section_tokens > self.max_prompt_tokens:
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(section)
+            batch_tokens += section_tokens
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _review_batch(self, sections: List[str], context: str) -> List[ReviewComment]:
+        """Review a batch of file sections in a single AI request."""
+        combined_diff = "".join(sections)
 
         user_prompt = f"""Please review this pull request:
 
@@ -117,61 +253,66 @@ Combined diff of all files:
 {combined_diff}
 ```
 
-Provide your review as a JSON array."""
+Provide your review as JSON."""
+
+        cache_key = hashlib.sha256(user_prompt.encode()).hexdigest()
+        cached = self._review_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached AI review for identical diff")
+            return list(cached)
 
         try:
-            logger.info(
-                f"Sending combined PR review request to AI for {len(files_with_diffs)} files",
-            )
-            logger.info(
-                "User Prompt: %s",
-                user_prompt[:500] + "..." if len(user_prompt) > 500 else user_prompt,
-            )
-
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    ChatCompletionSystemMessageParam(content=system_prompt, role="system"),
-                    ChatCompletionUserMessageParam(content=user_prompt, role="user"),
-                ],
-                temperature=0.3,
-                max_tokens=4000,
-            )
+            logger.info("Sending combined PR review request to AI for %d files", len(sections))
+            # Precision in the format truncates lazily, only when the record is emitted
+            logger.info("User Prompt: %.500s", user_prompt)
+
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        ChatCompletionSystemMessageParam(content=SYSTEM_PROMPT, role="system"),
+                        ChatCompletionUserMessageParam(content=user_prompt, role="user"),
+                    ],
+                    temperature=0.3,
+                    max_tokens=4000,
+                    response_format=(REVIEW_RESPONSE_FORMAT if self.structured_output else omit),
+                )
 
             # Parse AI response
             ai_response = response.choices[0].message.content or ""
             comments = self._parse_ai_response(ai_response)
+            if comments is None:
+                # Don't cache a failed parse, so a retried /review asks the AI again
+                return []
 
-            logger.info(
-                f"AI reviewed PR with {len(files_with_diffs)} files: found {len(comments)} issues"
-            )
+            self._review_cache.set(cache_key, comments)
             return comments
 
         except Exception as e:
-            logger.error(f"Error during AI review: {str(e)}", exc_info=True)
+            logger.error("Error during AI review: %s", e, exc_info=True)
             return []
 
-    def _parse_ai_response(self, response: str) -> List[ReviewComment]:
-        """Parse AI response into ReviewComment objects."""
-        import json
+    def _truncate_patch(self, patch: str) -> str:
+        """Cut oversized patches (e.g. lock files) back to the last full line within the limit."""
+        if len(patch) <= self.max_patch_length:
+            return patch
+        return patch[: self.max_patch_length].rpartition("\n")[0]
 
+    def _parse_ai_response(self, response: str) -> Optional[List[ReviewComment]]:
+        """Parse AI response into ReviewComment objects, or None if it can't be parsed."""
         try:
-            # Try to extract JSON from the response
-            # AI might wrap it in markdown code blocks
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
-
-            issues = json.loads(response)
+            # Structured output is guaranteed to be bare JSON; otherwise the AI
+            # might wrap it in markdown code blocks
+            if not self.structured_output:
+                response = strip_code_fence(response)
+
+            issues = orjson.loads(response)
+            if isinstance(issues, dict):
+                issues = issues.get("comments")
 
             if not isinstance(issues, list):
-                logger.warning("AI response is not a list, returning empty comments")
-                return []
+                logger.warning("AI response is not a list of comments")
+                return None
 
             comments = []
             for issue in issues:
@@ -192,10 +333,10 @@ Provide your review as a JSON array."""
 
             return comments
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse AI response as JSON: {e}")
-            logger.debug(f"AI response was: {response}")
-            return []
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse AI response as JSON: %s", e)
+            logger.debug("AI response was: %s", response)
+            return None
         except Exception as e:
-            logger.error(f"Error parsing AI response: {e}")
-            return []
+            logger.error("Error parsing AI response: %s", e)
+            return None
@@ -1,13 +1,28 @@
+import asyncio
+import heapq
 import time
 import logging
+from datetime import datetime
+from types import MappingProxyType
 import httpx
 import jwt
-from typing import Optional, Dict, Any
+import orjson
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+# Refresh tokens this long before they expire, to absorb clock skew with GitHub
+TOKEN_EXPIRY_BUFFER_SECONDS = 300
+
+# Headers sent on every GitHub REST call; only Authorization varies per request
+GITHUB_API_HEADERS = MappingProxyType(
+    {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+)
+
 
 class GitHubAppCredentials(BaseModel):
     """GitHub App credentials."""
@@ -32,93 +47,149 @@ class GitHubAppAuthService:
     credentials: GitHubAppCredentials
     http_client: httpx.AsyncClient
     _installation_tokens: Dict[int, Dict[str, Any]]
+    _token_expirations: List[Tuple[float, int]]
+    _installation_ids: Dict[Tuple[str, str], int]
+    _private_key: RSAPrivateKey
+    _jwt: Optional[str]
+    _jwt_expires_at: int
+    _installation_id_locks: Dict[Tuple[str, str], asyncio.Lock]
+    _token_locks: Dict[int, asyncio.Lock]
 
     def __init__(self, credentials: GitHubAppCredentials, http_client: httpx.AsyncClient):
         self.credentials = credentials
         self.http_client = http_client
+        self._private_key = self._load_private_key(credentials.private_key)
         self._installation_tokens = {}
+        # Min-heap of (expires_at, installation_id) so cleanup only touches expired entries
+        self._token_expirations = []
+        self._installation_ids = {}
+        self._jwt = None
+        self._jwt_expires_at = 0
+        # Per-key locks so concurrent cache misses trigger a single GitHub request
+        self._installation_id_locks = {}
+        self._token_locks = {}
+
+    @staticmethod
+    def _load_private_key(private_key: str) -> RSAPrivateKey:
+        """Parse the PEM private key once so JWT signing doesn't re-parse it each time."""
+        key = load_pem_private_key(private_key.encode(), password=None)
+        if not isinstance(key, RSAPrivateKey):
+            raise ValueError("GitHub App private key must be an RSA key")
+        return key
 
     def generate_jwt(self) -> str:
-        """Generate a JWT for authenticating as the GitHub App."""
+        """Generate a JWT for authenticating as the GitHub App, reusing it until near expiry."""
         now = int(time.time())
+        if self._jwt and self._jwt_expires_at - now > TOKEN_EXPIRY_BUFFER_SECONDS:
+            return self._jwt
+
         payload = {
             "iat": now - 60,  # Issued at time (60 seconds in the past to account for clock drift)
             "exp": now + 600,  # JWT expiration (10 minutes)
             "iss": self.credentials.app_id,  # GitHub App's identifier
         }
 
-        return jwt.encode(payload, self.credentials.private_key, algorithm="RS256")
+        self._jwt = jwt.encode(payload, self._private_key, algorithm="RS256")
+        self._jwt_expires_at = now + 600
+        return self._jwt
 
     async def get_installation_id(self, owner: str, repo: str) -> Optional[int]:
         """Get the installation ID for a specific repository."""
+        # Installation IDs only change if the app is reinstalled, so cache them
+        cached_id = self._installation_ids.get((owner, repo))
+        if cached_id:
+            return cached_id
+
+        async with self._installation_id_locks.setdefault((owner, repo), asyncio.Lock()):
+            # Another coroutine may have resolved it while we waited
+            cached_id = self._installation_ids.get((owner, repo))
+            if cached_id:
+                return cached_id
+
+            return await self._fetch_installation_id(owner, repo)
+
+    async def _fetch_installation_id(self, owner: str, repo: str) -> Optional[int]:
+        """Look up the installation ID for a repository from GitHub and cache it."""
         jwt_token = self.generate_jwt()
-        headers = {
-            "Authorization": f"Bearer {jwt_token}",
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28",
-        }
+        headers = {**GITHUB_API_HEADERS, "Authorization": f"Bearer {jwt_token}"}
 
         url = f"https://api.github.com/repos/{owner}/{repo}/installation"
 
         try:
             response = await self.http_client.get(url, headers=headers)
             response.raise_for_status()
-            data = response.json()
-            return int(data.get("id")) if data.get("id") else None
+            data = orjson.loads(response.content)
+            if not data.get("id"):
+                return None
+
+            installation_id = int(data["id"])
+            self._installation_ids[(owner, repo)] = installation_id
+            return installation_id
         except httpx.HTTPStatusError as e:
-            logger.error(f"Failed to get installation ID for {owner}/{repo}: {e}")
+            logger.error("Failed to get installation ID for %s/%s: %s", owner, repo, e)
             return None
 
     def _cleanup_expired_tokens(self) -> None:
         """Remove expired tokens from cache."""
         current_time = time.time()
-        expired_ids = [
-            install_id
-            for install_id, token_data in self._installation_tokens.items()
-            if token_data["expires_at"] <= current_time
-        ]
-        for install_id in expired_ids:
-            del self._installation_tokens[install_id]
-
-        if expired_ids:
-            logger.debug(f"Cleaned up {len(expired_ids)} expired tokens")
+        expired_count = 0
+        while self._token_expirations and self._token_expirations[0][0] <= current_time:
+            expires_at, install_id = heapq.heappop(self._token_expirations)
+            # Skip heap entries left behind by a token that has since been replaced
+            token_data = self._installation_tokens.get(install_id)
+            if token_data and token_data["expires_at"] == expires_at:
+                del self._installation_tokens[install_id]
+                expired_count += 1
+
+        if expired_count:
+            logger.debug("Cleaned up %d expired tokens", expired_count)
 
     async def get_installation_access_token(self, installation_id: int) -> Optional[str]:
         """Get an installation access token for the GitHub App."""
-        # Clean up expired tokens from cache
-        self._cleanup_expired_tokens()
-
         # Check if we have a cached token that's still valid
+        cached_token = self._get_cached_token(installation_id)
+        if cached_token:
+            return cached_token
+
+        async with self._token_locks.setdefault(installation_id, asyncio.Lock()):
+            # Another coroutine may have fetched a token while we waited
+            cached_token = self._get_cached_token(installation_id)
+            if cached_token:
+                return cached_token
+
+            return await self._fetch_installation_access_token(installation_id)
+
+    def _get_cached_token(self, installation_id: int) -> Optional[str]:
+        """Return the cached token if it is valid beyond the expiry buffer."""
         cached = self._installation_tokens.get(installation_id)
-        if cached and cached["expires_at"] > time.time() + 60:  # 60 second buffer
+        if cached and cached["expires_at"] > time.time() + TOKEN_EXPIRY_BUFFER_SECONDS:
             return str(cached["token"])
+        return None
 
+    async def _fetch_installation_access_token(self, installation_id: int) -> Optional[str]:
+        """Request a new installation access token from GitHub and cache it."""
         jwt_token = self.generate_jwt()
-        headers = {
-            "Authorization": f"Bearer {jwt_token}",
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28",
-        }
+        headers = {**GITHUB_API_HEADERS, "Authorization": f"Bearer {jwt_token}"}
 
         url = f"https://api.github.com/app/installations/{installation_id}/access_tokens"
 
         try:
             response = await self.http_client.post(url, headers=headers)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
 
             token = str(data["token"])
-            expires_at = data["expires_at"]
+            # GitHub returns UTC ("Z"); fromisoformat keeps the offset, unlike mktime
+            expires_at = datetime.fromisoformat(data["expires_at"]).timestamp()
 
-            # Cache the token
-            self._installation_tokens[installation_id] = {
-                "token": token,
-                "expires_at": time.mktime(time.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ")),
-            }
+            # Evict expired tokens only when the cache grows, then cache the new one
+            self._cleanup_expired_tokens()
+            self._installation_tokens[installation_id] = {"token": token, "expires_at": expires_at}
+            heapq.heappush(self._token_expirations, (expires_at, installation_id))
 
             return token
         except httpx.HTTPStatusError as e:
-            logger.error(f"Failed to get installation access token: {e}")
+            logger.error("Failed to get installation access token: %s", e)
             return None
 
     async def get_token_for_repo(self, owner: str, repo: str) -> Optional[str]:
@@ -127,4 +198,13 @@ class GitHubAppAuthService:
         if not installation_id:
             return None
 
-        return await self.get_installation_access_token(installation_id)
+        token = await self.get_installation_access_token(installation_id)
+        if not token:
+            # The app may have been uninstalled or reinstalled; look the ID up again next time
+            self.invalidate_installation(owner, repo)
+
+        return token
+
+    def invalidate_installation(self, owner: str, repo: str) -> None:
+        """Forget the cached installation ID for a repository."""
+        self._installation_ids.pop((owner, repo), None)
@@ -1,13 +1,21 @@
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Tuple
 
 import httpx
+import orjson
 from pydantic import BaseModel
 
+from app.services.github_app_auth import GITHUB_API_HEADERS
 from app.services.github_auth import GitHubAuthService
+from app.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Maximum page size GitHub allows for /pulls/:n/files (default is 30)
+FILES_PER_PAGE = 100
+
 
 class PullRequestEvent(BaseModel):
     """GitHub Pull Request webhook event."""
@@ -18,7 +26,10 @@ class PullRequestEvent(BaseModel):
     repository: Dict[str, Any]
 
 
-class ReviewComment(BaseModel):
+# Internal hot-path types are slotted dataclasses: they only ever hold trusted GitHub data
+# or already-validated AI output, so Pydantic validation would be pure overhead
+@dataclass(slots=True, kw_only=True)
+class ReviewComment:
     """A review comment to post on a pull request."""
 
     path: str
@@ -30,7 +41,8 @@ class ReviewComment(BaseModel):
     start_side: Optional[str] = None
 
 
-class CodeDiff(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class CodeDiff:
     """Represents a code diff."""
 
     filename: str
@@ -47,6 +59,7 @@ class GitHubClient:
     base_url: str
     http_client: httpx.AsyncClient
     auth_service: GitHubAuthService
+    _diff_cache: TTLCache[Tuple[str, str, int, str], List["CodeDiff"]]
 
     def __init__(
         self,
@@ -56,25 +69,52 @@ class GitHubClient:
         self.base_url = "https://api.github.com"
         self.http_client = http_client
         self.auth_service = auth_service
+        # Diffs are immutable for a given head commit, so they can be reused across deliveries
+        self._diff_cache = TTLCache(maxsize=512, ttl=600)
 
     async def _get_headers(self, owner: str, repo: str) -> Dict[str, str]:
         """Get standard GitHub API headers with authorization."""
         return {
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28",
+            **GITHUB_API_HEADERS,
             "Authorization": await self.auth_service.get_auth_header(owner, repo),
         }
 
-    async def get_pr_diff(self, owner: str, repo: str, pr_number: int) -> List[CodeDiff]:
-        """Get the diff files for a pull request."""
+    async def get_pr_diff(
+        self, owner: str, repo: str, pr_number: int, head_sha: Optional[str] = None
+    ) -> List[CodeDiff]:
+        """Get the diff files for a pull request, cached per head commit when head_sha is given."""
+        if head_sha:
+            cache_key = (owner, repo, pr_number, head_sha)
+            cached = self._diff_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Using cached diff for PR #%s at %s", pr_number, head_sha)
+                return cached
+
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/files"
         headers = await self._get_headers(owner, repo)
 
-        response = await self.http_client.get(url, headers=headers)
+        response = await self.http_client.get(
+            url, headers=headers, params={"per_page": FILES_PER_PAGE}
+        )
         response.raise_for_status()
-        files = response.json()
+        files = orjson.loads(response.content)
+
+        # The first page tells us how many pages there are; fetch the rest concurrently
+        last_page = self._get_last_page(response)
+        if last_page > 1:
+            page_responses = await asyncio.gather(
+                *[
+                    self.http_client.get(
+                        url, headers=headers, params={"per_page": FILES_PER_PAGE, "page": page}
+                    )
+                    for page in range(2, last_page + 1)
+                ]
+            )
+            for page_response in page_responses:
+                page_response.raise_for_status()
+                files.extend(orjson.loads(page_response.content))
 
-        return [
+        diff_files = [
             CodeDiff(
                 filename=file["filename"],
                 status=file["status"],
@@ -86,6 +126,19 @@ class GitHubClient:
             for file in files
         ]
 
+        if head_sha:
+            self._diff_cache.set((owner, repo, pr_number, head_sha), diff_files)
+
+        return diff_files
+
+    @staticmethod
+    def _get_last_page(response: httpx.Response) -> int:
+        """Get the last page number from the response's Link header (1 if not paginated)."""
+        last_url = response.links.get("last", {}).get("url")
+        if not last_url:
+            return 1
+        return int(httpx.URL(last_url).params.get("page", 1))
+
     async def post_review(
         self,
         owner: str,
@@ -98,14 +151,22 @@ class GitHubClient:
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
         headers = await self._get_headers(owner, repo)
 
-        # Format comments for GitHub API
-        formatted_comments = [
-            {"path": comment.path, "body": comment.body, "line": comment.line, "side": comment.side}
-            for comment in comments
-        ]
-
-        payload = {"event": event, "comments": formatted_comments}
-
-        response = await self.http_client.post(url, headers=headers, json=payload)
+        # Encode straight to bytes with orjson (faster than httpx's stdlib json); it can't
+        # consume a generator, so the comments list is the only intermediate
+        body = orjson.dumps(
+            {
+                "event": event,
+                "comments": [
+                    {"path": c.path, "body": c.body, "line": c.line, "side": c.side}
+                    for c in comments
+                ],
+            }
+        )
+
+        response = await self.http_client.post(
+            url,
+            headers={**headers, "Content-Type": "application/json"},
+            content=body,
+        )
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
@@ -1,5 +1,11 @@
 """Utility for augmenting diffs with line numbers."""
 
+import re
+from typing import List
+
+# Captures the right side (new file) starting line from a hunk header
+HUNK_HEADER_PATTERN = re.compile(r"@@[^+]*\+(\d+)")
+
 
 def augment_diff_with_line_numbers(diff: str) -> str:
     """
@@ -31,47 +37,36 @@ def augment_diff_with_line_numbers(diff: str) -> str:
             12: +    return True
             13:
     """
-    lines = diff.split("\n")
-    augmented_lines = []
+    augmented_lines: List[str] = []
+    append = augmented_lines.append
     current_right_line = 0
 
-    for line in lines:
-        # Parse hunk headers to get starting line numbers
-        if line.startswith("@@"):
-            # Extract the right side line number (new file)
-            # Format: @@ -left_start,left_count +right_start,right_count @@
-            parts = line.split()
-            for part in parts:
-                if part.startswith("+"):
-                    # Extract starting line number
-                    right_info = part[1:].split(",")[0]
-                    current_right_line = int(right_info)
-                    break
-            augmented_lines.append(line)
-        elif line.startswith("---") or line.startswith("+++"):
-            # File headers - keep as is
-            augmented_lines.append(line)
-        elif line.startswith("diff --git") or line.startswith("index "):
-            # Diff metadata - keep as is
-            augmented_lines.append(line)
-        elif line.startswith("-"):
-            # Deleted line - keep as is
-            augmented_lines.append(line)
-        elif line.startswith("+"):
-            # Added line - has line number in new file
-            augmented_lines.append(f"{current_right_line}: {line}")
-            current_right_line += 1
-        elif line.startswith(" "):
-            # Context line - has line number in new file
-            augmented_lines.append(f"{current_right_line}: {line}")
+    # Dispatch on the first character; only a few prefixes need a longer check
+    for line in diff.split("\n"):
+        first = line[:1]
+        if first == "+" or first == " ":
+            if line.startswith("+++"):
+                # File header - keep as is
+                append(line)
+            else:
+                # Added or context line - has line number in new file
+                append(f"{current_right_line}: {line}")
+                current_right_line += 1
+        elif first == "-":
+            # Deleted line or "---" file header - keep as is
+            append(line)
+        elif first == "@" and line.startswith("@@"):
+            # Hunk header: @@ -left_start,left_count +right_start,right_count @@
+            match = HUNK_HEADER_PATTERN.match(line)
+            if match:
+                current_right_line = int(match.group(1))
+            append(line)
+        elif current_right_line > 0 and not line.startswith(("diff --git", "index ")):
+            # Other lines (empty, metadata) inside a hunk are treated as context
+            append(f"{current_right_line}: {line}")
             current_right_line += 1
         else:
-            # Other lines (empty, metadata) - keep as is
-            if current_right_line > 0:
-                # If we're in a hunk, treat empty lines as context
-                augmented_lines.append(f"{current_right_line}: {line}")
-                current_right_line += 1
-            else:
-                augmented_lines.append(line)
+            # Diff metadata or lines before the first hunk - keep as is
+            append(line)
 
     return "\n".join(augmented_lines)
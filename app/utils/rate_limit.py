@@ -0,0 +1,64 @@
+"""Pause outgoing requests to a host while it reports that we are rate limited."""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitGate:
+    """
+    httpx event hooks that hold requests back until a host's rate limit resets.
+
+    A 403/429 response carrying ``Retry-After`` or an exhausted ``X-RateLimit-Remaining``
+    closes the gate for that host; later requests to it sleep until the reset time instead
+    of spending a round trip on another rejection. Other hosts sharing the client are
+    unaffected.
+    """
+
+    _resume_at: Dict[str, float]
+
+    def __init__(self) -> None:
+        # Wall-clock time (GitHub's reset header is a Unix timestamp) per host
+        self._resume_at = {}
+
+    async def on_request(self, request: httpx.Request) -> None:
+        """Wait until the request's host is no longer rate limited."""
+        resume_at = self._resume_at.get(request.url.host)
+        if resume_at is None:
+            return
+
+        delay = resume_at - time.time()
+        if delay <= 0:
+            self._resume_at.pop(request.url.host, None)
+            return
+
+        logger.info("Rate limited by %s, waiting %.0fs", request.url.host, delay)
+        await asyncio.sleep(delay)
+
+    async def on_response(self, response: httpx.Response) -> None:
+        """Close the gate for the response's host if it says we are rate limited."""
+        if response.status_code not in (403, 429):
+            return
+
+        resume_at = self._get_resume_at(response.headers)
+        if resume_at is not None:
+            host = response.request.url.host
+            self._resume_at[host] = max(resume_at, self._resume_at.get(host, 0.0))
+
+    @staticmethod
+    def _get_resume_at(headers: httpx.Headers) -> Optional[float]:
+        """Get when requests may resume from Retry-After or X-RateLimit-Reset, if present."""
+        retry_after = headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return time.time() + int(retry_after)
+
+        reset = headers.get("X-RateLimit-Reset", "")
+        if headers.get("X-RateLimit-Remaining") == "0" and reset.isdigit():
+            return float(reset)
+
+        return None
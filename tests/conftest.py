@@ -0,0 +1,48 @@
+from functools import partial
+from unittest.mock import patch
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+    load_pem_private_key,
+)
+
+
+@pytest.fixture(scope="session")
+def rsa_private_key():
+    """Throwaway RSA private key, generated once per test run."""
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture(scope="session")
+def mock_private_key(rsa_private_key):
+    """PEM encoding of the session's RSA private key."""
+    return rsa_private_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+
+
+@pytest.fixture
+def skip_rsa_key_validation():
+    """Skip OpenSSL's RSA key check (tens of ms) when services load the generated test key."""
+    with patch(
+        "app.services.github_app_auth.load_pem_private_key",
+        partial(load_pem_private_key, unsafe_skip_rsa_key_validation=True),
+    ):
+        yield
+
+
+@pytest.fixture
+def make_http_client():
+    """Factory for AsyncClients that answer from a {(method, path): response} map."""
+
+    def make_client(routes):
+        return httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: routes[(request.method, request.url.path)]
+            )
+        )
+
+    return make_client
@@ -1,4 +1,15 @@
-from app.services.ai_service import FileDiff, AIReviewRequest, AIReviewResponse, ReviewComment
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.ai_service import (
+    REVIEW_RESPONSE_FORMAT,
+    AIReviewRequest,
+    AIReviewResponse,
+    AIService,
+    FileDiff,
+    ReviewComment,
+    estimate_tokens,
+)
 
 
 def test_file_diff():
@@ -32,3 +43,195 @@ def test_ai_review_response():
     assert len(response.comments) == 1
     assert response.comments[0].path == "test.py"
     assert response.summary == "Test summary"
+
+
+async def test_review_pull_request_limits_concurrency():
+    """Test that concurrent AI requests are capped by max_concurrency."""
+    service = AIService("test-key", "gpt-4", max_concurrency=2)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        message = MagicMock(content="[]")
+        return MagicMock(choices=[MagicMock(message=message)])
+
+    service.client = MagicMock()
+    service.client.chat.completions.create = create
+
+    files = [FileDiff(name="test.py", diff="@@ -1,1 +1,1 @@\n+x")]
+    results = await asyncio.gather(*[service.review_pull_request(files) for _ in range(5)])
+
+    assert results == [[]] * 5
+    assert max_in_flight == 2
+
+
+def test_parse_ai_response_with_code_block():
+    """Test parsing a JSON array wrapped in a markdown code block."""
+    service = AIService("test-key", "gpt-4")
+    response = '```json\n[{"path": "test.py", "line": "10", "comment": "Bug here"}]\n```'
+
+    comments = service._parse_ai_response(response)
+
+    assert len(comments) == 1
+    assert comments[0].path == "test.py"
+    assert comments[0].line == 10
+    assert comments[0].body == "Bug here"
+
+
+def test_parse_ai_response_long_whitespace_run():
+    """Test that runaway whitespace in the AI response is parsed in linear time."""
+    service = AIService("test-key", "gpt-4")
+    whitespace = " " * 100_000 + "\n" * 100_000
+    issue = '{"path": "a.py", "line": 1, "comment": "x"}'
+    response = f"```json{whitespace}[{whitespace}{issue}]{whitespace}```"
+
+    comments = service._parse_ai_response(response)
+
+    assert [(c.path, c.line) for c in comments] == [("a.py", 1)]
+
+
+def test_parse_ai_response_invalid_json():
+    """Test that invalid JSON is reported as a failed parse."""
+    service = AIService("test-key", "gpt-4")
+    assert service._parse_ai_response("not json") is None
+
+
+def test_parse_ai_response_without_code_block():
+    """Test parsing a bare JSON array surrounded by whitespace."""
+    service = AIService("test-key", "gpt-4")
+    response = '\n  [{"path": "a.py", "line": 3, "comment": "Issue"}]  \n'
+
+    comments = service._parse_ai_response(response)
+
+    assert [(c.path, c.line, c.body) for c in comments] == [("a.py", 3, "Issue")]
+
+
+def test_truncate_patch():
+    """Test that oversized patches are cut back to the last full line."""
+    service = AIService("test-key", "gpt-4", max_patch_length=10)
+
+    assert service._truncate_patch("+a\n+b") == "+a\n+b"
+    assert service._truncate_patch("+line1\n+line2\n+line3") == "+line1"
+
+
+async def test_review_pull_request_cached_for_identical_diff():
+    """Test that an identical diff reuses the previous AI review."""
+    service = AIService("test-key", "gpt-4")
+    message = MagicMock(content='[{"path": "test.py", "line": 1, "comment": "Issue"}]')
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(choices=[MagicMock(message=message)])
+    )
+    files = [FileDiff(name="test.py", diff="@@ -1,1 +1,1 @@\n+x")]
+
+    first = await service.review_pull_request(files, context="PR #1")
+    second = await service.review_pull_request(files, context="PR #1")
+
+    assert [c.body for c in first] == [c.body for c in second] == ["Issue"]
+    service.client.chat.completions.create.assert_awaited_once()
+
+
+async def test_review_pull_request_does_not_cache_unparseable_response():
+    """Test that a response that fails to parse is retried rather than cached as no issues."""
+    service = AIService("test-key", "gpt-4")
+    bad = MagicMock(content="not json")
+    good = MagicMock(content='[{"path": "test.py", "line": 1, "comment": "Issue"}]')
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock(
+        side_effect=[
+            MagicMock(choices=[MagicMock(message=bad)]),
+            MagicMock(choices=[MagicMock(message=good)]),
+        ]
+    )
+    files = [FileDiff(name="test.py", diff="@@ -1,1 +1,1 @@\n+x")]
+
+    assert await service.review_pull_request(files, context="PR #1") == []
+    second = await service.review_pull_request(files, context="PR #1")
+
+    assert [c.body for c in second] == ["Issue"]
+    assert service.client.chat.completions.create.await_count == 2
+
+
+async def test_review_pull_request_structured_output():
+    """Test that structured output requests a JSON schema and parses the object response."""
+    service = AIService("test-key", "gpt-4o", structured_output=True)
+    message = MagicMock(content='{"comments": [{"path": "a.py", "line": 1, "comment": "Issue"}]}')
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(choices=[MagicMock(message=message)])
+    )
+
+    comments = await service.review_pull_request([FileDiff(name="a.py", diff="+x")])
+
+    assert [(c.path, c.line, c.body) for c in comments] == [("a.py", 1, "Issue")]
+    kwargs = service.client.chat.completions.create.call_args.kwargs
+    assert kwargs["response_format"] is REVIEW_RESPONSE_FORMAT
+
+
+def test_batch_sections_within_token_budget():
+    """Test that file sections are packed greedily into batches under the token budget."""
+    service = AIService("test-key", "gpt-4", max_prompt_tokens=10)
+    small = "x" * 12  # ~4 tokens
+    large = "y" * 80  # ~21 tokens
+
+    batches = service._batch_sections([small, small, small, large, small])
+
+    assert batches == [[small, small], [small], [large], [small]]
+
+
+async def test_review_pull_request_splits_large_prs():
+    """Test that PRs exceeding the token budget are reviewed in concurrent batches."""
+    service = AIService("test-key", "gpt-4", max_prompt_tokens=10)
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock(
+        side_effect=[
+            MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+            for content in (
+                '[{"path": "a.py", "line": 1, "comment": "A"}]',
+                '[{"path": "b.py", "line": 1, "comment": "B"}]',
+            )
+        ]
+    )
+    files = [FileDiff(name="a.py", diff="+" + "a" * 40), FileDiff(name="b.py", diff="+" + "b" * 40)]
+
+    comments = await service.review_pull_request(files)
+
+    assert [c.body for c in comments] == ["A", "B"]
+    assert service.client.chat.completions.create.await_count == 2
+
+
+async def test_review_pull_request_truncates_long_patch():
+    """Test that with the defaults, a long patch is cut by max_patch_length and fits the budget."""
+    service = AIService("test-key", "gpt-4")
+    service._review_batch = AsyncMock(return_value=[])
+    diff = "@@ -1,1 +1,400 @@\n" + "\n".join(
+        f"+    value_{i:04} = compute(value_{i:04})" for i in range(400)
+    )
+    assert len(diff) > service.max_patch_length
+
+    await service.review_pull_request([FileDiff(name="big.py", diff=diff)])
+
+    (sections, _), _ = service._review_batch.await_args
+    assert sections[0].endswith(
+        service._truncate_patch(diff).rpartition("\n")[2] + "\n... (diff truncated)"
+    )
+    assert estimate_tokens(sections[0]) <= service.max_prompt_tokens
+
+
+async def test_review_pull_request_truncates_oversized_file_to_budget():
+    """Test that a file over the prompt budget is truncated to fit its own batch."""
+    service = AIService("test-key", "gpt-4", max_patch_length=100_000)
+    service._review_batch = AsyncMock(return_value=[])
+    diff = "@@ -1,1 +1,1500 @@\n" + "\n".join(f"+line {i}" for i in range(1500))
+
+    await service.review_pull_request([FileDiff(name="big.py", diff=diff)])
+
+    (sections, _), _ = service._review_batch.await_args
+    assert len(sections) == 1
+    assert estimate_tokens(sections[0]) <= service.max_prompt_tokens
+    assert sections[0].endswith("\n... (diff truncated)")
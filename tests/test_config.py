@@ -12,6 +12,10 @@ def test_settings_default_values():
         assert settings.ai_api_key == ""
         assert settings.ai_model == "gpt-4"
         assert settings.ai_base_url is None
+        assert settings.ai_concurrency == 4
+        assert settings.ai_max_patch_length == 8000
+        assert settings.ai_max_prompt_tokens == 3000
+        assert settings.ai_structured_output is False
         assert settings.log_level == "INFO"
         assert settings.environment == "development"
 
@@ -24,6 +28,7 @@ def test_settings_from_environment_variables():
         "AI_API_KEY": "test-api-key",
         "AI_MODEL": "gpt-3.5-turbo",
         "AI_BASE_URL": "https://custom-api.example.com",
+        "AI_CONCURRENCY": "8",
         "LOG_LEVEL": "DEBUG",
         "ENVIRONMENT": "production",
     }
@@ -36,5 +41,6 @@ def test_settings_from_environment_variables():
         assert settings.ai_api_key == "test-api-key"
         assert settings.ai_model == "gpt-3.5-turbo"
         assert settings.ai_base_url == "https://custom-api.example.com"
+        assert settings.ai_concurrency == 8
         assert settings.log_level == "DEBUG"
         assert settings.environment == "production"
@@ -1,4 +1,23 @@
-from app.services.github_client import CodeDiff, PullRequestEvent, ReviewComment
+import httpx
+import orjson
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.github_client import CodeDiff, GitHubClient, PullRequestEvent, ReviewComment
+
+
+@pytest.fixture
+def http_client():
+    """Create a mock HTTP client."""
+    return MagicMock(spec=httpx.AsyncClient)
+
+
+@pytest.fixture
+def github_client(http_client):
+    """Create a GitHubClient instance with a stub auth service for testing."""
+    auth_service = MagicMock()
+    auth_service.get_auth_header = AsyncMock(return_value="Bearer token")
+    return GitHubClient(http_client=http_client, auth_service=auth_service)
 
 
 def test_code_diff():
@@ -40,3 +59,96 @@ def test_pull_request_event():
     assert event.number == 123
     assert event.pull_request["title"] == "Test PR"
     assert event.repository["name"] == "test-repo"
+
+
+async def test_get_pr_diff_cached_by_head_sha(github_client, http_client):
+    """Test that diffs are fetched once per head commit."""
+    response = MagicMock()
+    response.links = {}
+    response.content = orjson.dumps(
+        [
+            {
+                "filename": "test.py",
+                "status": "modified",
+                "additions": 1,
+                "deletions": 0,
+                "changes": 1,
+                "patch": "@@ -1,1 +1,2 @@",
+            }
+        ]
+    )
+    http_client.get = AsyncMock(return_value=response)
+
+    first = await github_client.get_pr_diff("owner", "repo", 1, head_sha="abc123")
+    second = await github_client.get_pr_diff("owner", "repo", 1, head_sha="abc123")
+    await github_client.get_pr_diff("owner", "repo", 1, head_sha="def456")
+
+    assert first == second
+    assert first[0].filename == "test.py"
+    assert http_client.get.await_count == 2
+
+
+async def test_get_pr_diff_without_patch(github_client, http_client):
+    """Test that files without a patch (e.g. binaries) have patch set to None."""
+    response = MagicMock()
+    response.links = {}
+    response.content = orjson.dumps(
+        [{"filename": "image.png", "status": "added", "additions": 0, "deletions": 0, "changes": 0}]
+    )
+    http_client.get = AsyncMock(return_value=response)
+
+    diff_files = await github_client.get_pr_diff("owner", "repo", 1)
+
+    assert diff_files[0].filename == "image.png"
+    assert diff_files[0].patch is None
+
+
+async def test_get_pr_diff_fetches_remaining_pages_concurrently(github_client, http_client):
+    """Test that all pages listed in the Link header are fetched and concatenated."""
+    url = "https://api.github.com/repos/owner/repo/pulls/1/files"
+
+    def page(number: int) -> MagicMock:
+        response = MagicMock()
+        response.links = {"last": {"url": f"{url}?per_page=100&page=3"}} if number == 1 else {}
+        response.content = orjson.dumps(
+            [
+                {
+                    "filename": f"file{number}.py",
+                    "status": "modified",
+                    "additions": 1,
+                    "deletions": 0,
+                    "changes": 1,
+                }
+            ]
+        )
+        return response
+
+    http_client.get = AsyncMock(side_effect=[page(1), page(2), page(3)])
+
+    diff_files = await github_client.get_pr_diff("owner", "repo", 1)
+
+    assert [file.filename for file in diff_files] == ["file1.py", "file2.py", "file3.py"]
+    requested_pages = [
+        call.kwargs["params"].get("page") for call in http_client.get.await_args_list
+    ]
+    assert requested_pages == [None, 2, 3]
+    assert all(call.kwargs["params"]["per_page"] == 100 for call in http_client.get.await_args_list)
+
+
+async def test_post_review_sends_orjson_body(github_client, http_client):
+    """Test that the review payload is posted as pre-encoded JSON bytes."""
+    response = MagicMock()
+    response.content = b'{"id": 1}'
+    http_client.post = AsyncMock(return_value=response)
+
+    result = await github_client.post_review(
+        "owner", "repo", 1, [ReviewComment(path="a.py", line=3, body="Fix this")]
+    )
+
+    assert result == {"id": 1}
+    kwargs = http_client.post.await_args.kwargs
+    assert kwargs["headers"]["Content-Type"] == "application/json"
+    assert orjson.loads(kwargs["content"]) == {
+        "event": "COMMENT",
+        "comments": [{"path": "a.py", "body": "Fix this", "line": 3, "side": "RIGHT"}],
+    }
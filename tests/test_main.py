@@ -1,25 +1,54 @@
-import pytest
+import httpx
+import pytest_asyncio
 from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.config import Settings
+from app.dependencies import create_http_client
 from app.main import app
 
 
-@pytest.fixture
-def client():
-    """Create a test client."""
-    return TestClient(app)
+@pytest_asyncio.fixture(scope="module")
+async def client():
+    """Create an async test client shared by the read-only endpoint tests."""
+    # Call the ASGI app directly in the event loop, without TestClient's thread bridge
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
 
 
-def test_root_endpoint(client):
+async def test_root_endpoint(client):
     """Test the root endpoint."""
-    response = client.get("/")
+    response = await client.get("/")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
     assert "service" in data
 
 
-def test_health_endpoint(client):
+async def test_health_endpoint(client):
     """Test the health endpoint."""
-    response = client.get("/health")
+    response = await client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
+
+
+def test_lifespan_builds_and_closes_services():
+    """Test that services are built on startup and the HTTP client is closed on shutdown."""
+    settings = Settings(_env_file=None, github_token="ghp_test_token", ai_api_key="test-key")
+    with patch("app.main.settings", settings):
+        with TestClient(app):
+            http_client = app.state.http_client
+            assert app.state.settings is settings
+            assert app.state.github_client.http_client is http_client
+            assert app.state.ai_service.client._client is http_client
+            assert not http_client.is_closed
+    assert http_client.is_closed
+
+
+def test_create_http_client_uses_http2_and_gzip():
+    """Test that the shared HTTP client negotiates HTTP/2 and compressed responses."""
+    http_client = create_http_client()
+    assert http_client._transport._pool._http2
+    assert "gzip" in http_client.headers["Accept-Encoding"]
@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import hmac
+
+import orjson
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+from app.api import webhooks
+from app.api.webhooks import (
+    MAX_PAYLOAD_SIZE,
+    PullRequestRef,
+    process_pull_request_review,
+    verify_signature,
+)
+from app.dependencies import get_ai_service, get_github_client, get_webhook_secret
+from app.main import app
+from app.services.ai_service import ReviewComment as AIReviewComment
+from app.services.github_client import CodeDiff
+from app.utils.cache import TTLCache
+
+WEBHOOK_SECRET = "test-webhook-secret"
+
+PR = PullRequestRef(owner="owner", repo="repo", pr_number=1, head_sha="abc123")
+
+
+def sign(body: bytes, secret: str = WEBHOOK_SECRET) -> str:
+    """Compute the X-Hub-Signature-256 header value for a body."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def fresh_posted_reviews(monkeypatch):
+    """Give each test an empty record of posted reviews."""
+    monkeypatch.setattr(webhooks, "_posted_reviews", TTLCache(maxsize=1024, ttl=600))
+
+
+@pytest.fixture
+def mock_github_client():
+    """Create a mock GitHub client."""
+    github_client = MagicMock()
+    github_client.get_pr_diff = AsyncMock(return_value=[])
+    github_client.post_review = AsyncMock()
+    return github_client
+
+
+@pytest.fixture
+def client(mock_github_client):
+    """Create a test client with mocked service dependencies."""
+    app.dependency_overrides[get_webhook_secret] = lambda: WEBHOOK_SECRET.encode()
+    app.dependency_overrides[get_github_client] = lambda: mock_github_client
+    app.dependency_overrides[get_ai_service] = lambda: MagicMock()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_verify_signature_valid():
+    """Test that a correct signature is accepted."""
+    body = b'{"action": "opened"}'
+    assert verify_signature(body, sign(body), WEBHOOK_SECRET.encode())
+
+
+@pytest.mark.parametrize(
+    "signature",
+    ["", "sha256", "sha1=" + "0" * 40, "sha256=" + "0" * 63, "sha256=" + "z" * 64],
+)
+def test_verify_signature_malformed(signature):
+    """Test that malformed signature headers are rejected."""
+    assert not verify_signature(b"{}", signature, WEBHOOK_SECRET.encode())
+
+
+def test_webhook_payload_too_large(client):
+    """Test that oversized payloads are rejected before verification."""
+    response = client.post(
+        "/webhooks/github",
+        content=b"{}",
+        headers={"Content-Length": str(MAX_PAYLOAD_SIZE + 1), "X-GitHub-Event": "ping"},
+    )
+    assert response.status_code == 413
+
+
+def test_webhook_invalid_signature(client):
+    """Test that requests with an invalid signature are rejected."""
+    body = orjson.dumps({"action": "opened"})
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={
+            "X-Hub-Signature-256": sign(body, "wrong-secret"),
+            "X-GitHub-Event": "pull_request",
+        },
+    )
+    assert response.status_code == 401
+
+
+def test_webhook_missing_signature(client):
+    """Test that requests without a signature are rejected."""
+    response = client.post(
+        "/webhooks/github", content=b"{}", headers={"X-GitHub-Event": "pull_request"}
+    )
+    assert response.status_code == 401
+
+
+def test_webhook_invalid_payload(client):
+    """Test that a correctly signed but malformed payload is rejected."""
+    body = b"not json"
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "pull_request"},
+    )
+    assert response.status_code == 400
+
+
+def test_webhook_ping_event(client):
+    """Test that ping events are answered without a signature."""
+    response = client.post("/webhooks/github", content=b"{}", headers={"X-GitHub-Event": "ping"})
+    assert response.status_code == 200
+    assert response.json() == {"status": "pong"}
+
+
+def test_webhook_unhandled_event(client):
+    """Test that unhandled events are skipped before verifying the body."""
+    response = client.post("/webhooks/github", content=b"{}", headers={"X-GitHub-Event": "push"})
+    assert response.status_code == 204
+
+
+def test_webhook_ignored_action(client, mock_github_client):
+    """Test that unhandled actions of a handled event are ignored."""
+    body = orjson.dumps({"action": "closed", "number": 42})
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "pull_request"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"status": "ignored"}
+    mock_github_client.get_pr_diff.assert_not_awaited()
+
+
+def test_webhook_pull_request_opened(client, mock_github_client):
+    """Test that an opened pull request triggers a review."""
+    body = orjson.dumps(
+        {
+            "action": "opened",
+            "number": 42,
+            "pull_request": {"head": {"sha": "abc123"}},
+            "repository": {"full_name": "owner/repo"},
+        }
+    )
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "pull_request"},
+    )
+    assert response.status_code == 202
+    assert response.json() == {"status": "queued"}
+    mock_github_client.get_pr_diff.assert_awaited_once_with("owner", "repo", 42, "abc123")
+
+
+def test_webhook_review_command(client, mock_github_client):
+    """Test that a /review comment on a pull request triggers a review."""
+    body = orjson.dumps(
+        {
+            "action": "created",
+            "comment": {"body": "/review"},
+            "issue": {"number": 7, "pull_request": {}},
+            "repository": {"full_name": "owner/repo"},
+        }
+    )
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "issue_comment"},
+    )
+    assert response.status_code == 202
+    assert response.json() == {"status": "queued"}
+    mock_github_client.get_pr_diff.assert_awaited_once_with("owner", "repo", 7, None)
+
+
+def test_webhook_review_errors_are_not_raised(client, mock_github_client):
+    """Test that a failing background review does not break the response."""
+    mock_github_client.get_pr_diff.side_effect = RuntimeError("GitHub unavailable")
+    body = orjson.dumps(
+        {
+            "action": "synchronize",
+            "number": 42,
+            "pull_request": {"head": {"sha": "abc123"}},
+            "repository": {"full_name": "owner/repo"},
+        }
+    )
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "pull_request"},
+    )
+    assert response.status_code == 202
+
+
+async def test_concurrent_identical_reviews_are_coalesced():
+    """Test that identical reviews running concurrently only fetch and review once."""
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def get_pr_diff(*args):
+        started.set()
+        await release.wait()
+        return [CodeDiff(filename="a.py", status="modified", additions=1, deletions=0, changes=1)]
+
+    github_client = MagicMock()
+    github_client.get_pr_diff = AsyncMock(side_effect=get_pr_diff)
+    ai_service = MagicMock()
+
+    first = asyncio.create_task(process_pull_request_review(PR, github_client, ai_service))
+    await started.wait()
+    second = asyncio.create_task(process_pull_request_review(PR, github_client, ai_service))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(first, second)
+
+    github_client.get_pr_diff.assert_awaited_once()
+    assert not second.exception()
+
+
+def test_webhook_comment_without_review_command(client, mock_github_client):
+    """Test that ordinary PR comments are ignored."""
+    body = orjson.dumps(
+        {
+            "action": "created",
+            "comment": {"body": "Looks good to me"},
+            "issue": {"number": 7, "pull_request": {}},
+            "repository": {"full_name": "owner/repo"},
+        }
+    )
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-Hub-Signature-256": sign(body), "X-GitHub-Event": "issue_comment"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"status": "ignored"}
+    mock_github_client.get_pr_diff.assert_not_awaited()
+
+
+async def test_process_pull_request_review_posts_comments():
+    """Test that AI comments are converted and posted as a GitHub review."""
+    github_client = MagicMock()
+    github_client.get_pr_diff = AsyncMock(
+        return_value=[
+            CodeDiff(
+                filename="a.py", status="modified", additions=1, deletions=0, changes=1, patch="+x"
+            ),
+            CodeDiff(filename="b.png", status="added", additions=0, deletions=0, changes=0),
+        ]
+    )
+    github_client.post_review = AsyncMock()
+    ai_service = MagicMock()
+    ai_service.review_pull_request = AsyncMock(
+        return_value=[AIReviewComment(path="a.py", line=1, body="Issue")]
+    )
+
+    await process_pull_request_review(PR, github_client, ai_service)
+
+    files = ai_service.review_pull_request.call_args.kwargs["files_with_diffs"]
+    assert [(f.name, f.diff) for f in files] == [("a.py", "+x")]
+    owner, repo, pr_number, comments = github_client.post_review.call_args.args
+    assert [(c.path, c.line, c.body, c.side) for c in comments] == [("a.py", 1, "Issue", "RIGHT")]
+
+
+async def test_redelivered_review_is_posted_once():
+    """Test that processing the same review twice posts it only once."""
+    github_client = MagicMock()
+    github_client.get_pr_diff = AsyncMock(
+        return_value=[
+            CodeDiff(
+                filename="a.py", status="modified", additions=1, deletions=0, changes=1, patch="+x"
+            )
+        ]
+    )
+    github_client.post_review = AsyncMock()
+    ai_service = MagicMock()
+    ai_service.review_pull_request = AsyncMock(
+        return_value=[AIReviewComment(path="a.py", line=1, body="Issue")]
+    )
+
+    await process_pull_request_review(PR, github_client, ai_service)
+    await process_pull_request_review(PR, github_client, ai_service)
+
+    github_client.post_review.assert_awaited_once()
+
+
+def test_pull_request_ref_from_payload():
+    """Test that repository owner and name are split from the payload."""
+    pr = PullRequestRef.from_payload({"repository": {"full_name": "owner/repo"}}, 5, "abc123")
+    assert pr == PullRequestRef(owner="owner", repo="repo", pr_number=5, head_sha="abc123")
+    assert str(pr) == "PR #5 in owner/repo"
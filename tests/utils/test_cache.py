@@ -0,0 +1,41 @@
+"""Tests for the TTL cache utility."""
+
+from unittest.mock import patch
+
+from app.utils.cache import TTLCache
+
+
+class TestTTLCache:
+    """Test cases for TTLCache."""
+
+    def test_get_missing_key(self):
+        """Test that a missing key returns None."""
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        assert cache.get("missing") is None
+
+    def test_set_and_get(self):
+        """Test that stored values are returned."""
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+    def test_expired_entry(self):
+        """Test that entries are dropped once their TTL has passed."""
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        with patch("time.monotonic", return_value=1000):
+            cache.set("a", 1)
+        with patch("time.monotonic", return_value=1060):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
@@ -1,60 +1,56 @@
 """Tests for diff augmentation utility."""
 
-from app.utils.diff_augmenter import augment_diff_with_line_numbers
+import pytest
 
+from app.utils.diff_augmenter import augment_diff_with_line_numbers
 
-class TestAugmentDiffWithLineNumbers:
-    """Test cases for augment_diff_with_line_numbers function."""
 
-    def test_simple_addition(self):
-        """Test diff with only added lines."""
-        diff = """diff --git a/example.py b/example.py
+@pytest.mark.parametrize(
+    "diff, expected",
+    [
+        # Only added lines
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,3 +10,5 @@ def example():
      return True
 +    # New comment
-+    print("added")"""
-
-        expected = """diff --git a/example.py b/example.py
++    print("added")""",
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,3 +10,5 @@ def example():
 10:      return True
 11: +    # New comment
-12: +    print("added")"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_simple_deletion(self):
-        """Test diff with only deleted lines."""
-        diff = """diff --git a/example.py b/example.py
+12: +    print("added")""",
+            id="simple_addition",
+        ),
+        # Only deleted lines
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,4 +10,2 @@ def example():
      return True
 -    # Old comment
--    print("removed")"""
-
-        expected = """diff --git a/example.py b/example.py
+-    print("removed")""",
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,4 +10,2 @@ def example():
 10:      return True
 -    # Old comment
--    print("removed")"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_mixed_changes(self):
-        """Test diff with added, deleted, and context lines."""
-        diff = """diff --git a/example.py b/example.py
+-    print("removed")""",
+            id="simple_deletion",
+        ),
+        # Added, deleted, and context lines
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -63,9 +59,8 @@ index 1234567..abcdefg 100644
 -    print("old")
 +    print("new")
 +    return True
-     """
-
-        expected = """diff --git a/example.py b/example.py
+     """,
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -74,14 +69,12 @@ index 1234567..abcdefg 100644
 -    print("old")
 11: +    print("new")
 12: +    return True
-13:      """
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_multiple_hunks(self):
-        """Test diff with multiple hunks."""
-        diff = """diff --git a/example.py b/example.py
+13:      """,
+            id="mixed_changes",
+        ),
+        # Multiple hunks
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -92,9 +85,8 @@ index 1234567..abcdefg 100644
 @@ -20,2 +21,3 @@ class Example:
      def method(self):
 +        # New comment
-         return True"""
-
-        expected = """diff --git a/example.py b/example.py
+         return True""",
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -105,44 +97,38 @@ index 1234567..abcdefg 100644
 @@ -20,2 +21,3 @@ class Example:
 21:      def method(self):
 22: +        # New comment
-23:          return True"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_empty_diff(self):
-        """Test empty diff string."""
-        diff = ""
-        expected = ""
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_context_only_diff(self):
-        """Test diff with only context lines."""
-        diff = """diff --git a/example.py b/example.py
+23:          return True""",
+            id="multiple_hunks",
+        ),
+        # Empty diff string
+        pytest.param(
+            "",
+            "",
+            id="empty_diff",
+        ),
+        # Only context lines
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,3 +10,3 @@ def example():
      line1
      line2
-     line3"""
-
-        expected = """diff --git a/example.py b/example.py
+     line3""",
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
 @@ -10,3 +10,3 @@ def example():
 10:      line1
 11:      line2
-12:      line3"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_new_file(self):
-        """Test diff for a newly created file."""
-        diff = """diff --git a/new_file.py b/new_file.py
+12:      line3""",
+            id="context_only_diff",
+        ),
+        # A newly created file
+        pytest.param(
+            """diff --git a/new_file.py b/new_file.py
 new file mode 100644
 index 0000000..1234567
 --- /dev/null
@@ -150,9 +136,8 @@ index 0000000..1234567
 @@ -0,0 +1,3 @@
 +def new_function():
 +    pass
-+    return True"""
-
-        expected = """diff --git a/new_file.py b/new_file.py
++    return True""",
+            """diff --git a/new_file.py b/new_file.py
 new file mode 100644
 index 0000000..1234567
 --- /dev/null
@@ -160,14 +145,12 @@ index 0000000..1234567
 @@ -0,0 +1,3 @@
 1: +def new_function():
 2: +    pass
-3: +    return True"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
-
-    def test_line_number_continuation(self):
-        """Test that line numbers continue correctly through the diff."""
-        diff = """diff --git a/example.py b/example.py
+3: +    return True""",
+            id="new_file",
+        ),
+        # Line numbers continue correctly through the diff
+        pytest.param(
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -179,9 +162,8 @@ index 1234567..abcdefg 100644
 +    added_line103
      line104
      line105
-     line106"""
-
-        expected = """diff --git a/example.py b/example.py
+     line106""",
+            """diff --git a/example.py b/example.py
 index 1234567..abcdefg 100644
 --- a/example.py
 +++ b/example.py
@@ -193,7 +175,11 @@ index 1234567..abcdefg 100644
 103: +    added_line103
 104:      line104
 105:      line105
-106:      line106"""
-
-        result = augment_diff_with_line_numbers(diff)
-        assert result == expected
+106:      line106""",
+            id="line_number_continuation",
+        ),
+    ],
+)
+def test_augment_diff_with_line_numbers(diff, expected):
+    """Test that diffs are augmented with right-side line numbers."""
+    assert augment_diff_with_line_numbers(diff) == expected
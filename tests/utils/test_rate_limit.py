@@ -0,0 +1,74 @@
+"""Tests for the rate limit gate."""
+
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.utils.rate_limit import RateLimitGate
+
+
+def make_client(gate: RateLimitGate, handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [gate.on_request], "response": [gate.on_response]},
+    )
+
+
+class TestRateLimitGate:
+    """Test cases for RateLimitGate."""
+
+    async def test_waits_for_rate_limit_reset(self):
+        """Test that requests after an exhausted rate limit wait until the reset time."""
+        gate = RateLimitGate()
+        responses = [
+            httpx.Response(
+                403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1030"}
+            ),
+            httpx.Response(200),
+        ]
+
+        async with make_client(gate, lambda request: responses.pop(0)) as client:
+            with (
+                patch("time.time", return_value=1000),
+                patch("asyncio.sleep", new=AsyncMock()) as sleep,
+            ):
+                await client.get("https://api.github.com/repos/owner/repo")
+                response = await client.get("https://api.github.com/repos/owner/repo")
+
+        assert response.status_code == 200
+        sleep.assert_awaited_once_with(30)
+
+    async def test_retry_after(self):
+        """Test that Retry-After on a 429 closes the gate for that many seconds."""
+        gate = RateLimitGate()
+        responses = [httpx.Response(429, headers={"Retry-After": "60"}), httpx.Response(200)]
+
+        async with make_client(gate, lambda request: responses.pop(0)) as client:
+            with (
+                patch("time.time", return_value=1000),
+                patch("asyncio.sleep", new=AsyncMock()) as sleep,
+            ):
+                await client.get("https://api.github.com/repos/owner/repo")
+                await client.get("https://api.github.com/repos/owner/repo")
+
+        sleep.assert_awaited_once_with(60)
+
+    async def test_other_hosts_and_errors_not_gated(self):
+        """Test that plain 403s and other hosts don't wait."""
+        gate = RateLimitGate()
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "60"}),
+            httpx.Response(403),
+            httpx.Response(200),
+        ]
+
+        async with make_client(gate, lambda request: responses.pop(0)) as client:
+            with (
+                patch("time.time", return_value=1000),
+                patch("asyncio.sleep", new=AsyncMock()) as sleep,
+            ):
+                await client.get("https://api.openai.com/v1/models")
+                await client.get("https://api.github.com/repos/owner/repo")
+                await client.get("https://api.github.com/repos/owner/repo")
+
+        sleep.assert_not_awaited()